@@ -1,17 +1,27 @@
 # app.py
-from flask import Flask, jsonify, request
+import orjson
+from flask import Flask, Response, request
 from collections import deque
-from logistech.controller import LogiMaster
 from logistech.models import Package
 from db.setup import initialize_db
 
 # --- INITIAL SETUP ---
 initialize_db() # Ensure a clean DB is loaded on startup
+# Imported after initialize_db(): the controller instance loads its bins at import time
+from logistech.controller import logimaster as wm
 app = Flask(__name__)
-wm = LogiMaster()
+
+@app.teardown_appcontext
+def shutdown_session(exception=None):
+    """Releases the request thread's scoped SQLAlchemy session."""
+    wm.Session.remove()
 
 # --- HELPER FUNCTIONS ---
 
+def _json(obj, status=200):
+    """Serializes a JSON response with orjson (faster than Flask's jsonify)."""
+    return Response(orjson.dumps(obj), status=status, mimetype='application/json')
+
 def _package_to_dict(package_data):
     """Converts a database Package record to a JSON-friendly dict."""
     return {
@@ -28,9 +38,9 @@ def _package_to_dict(package_data):
 @app.route('/api/status', methods=['GET'])
 def get_status():
     """Returns the current state of the warehouse system."""
-    bin_status = [str(b) for b in wm.bin_inventory]
+    bin_status = wm.get_bin_status() # Cached until a bin's occupancy changes
     
-    return jsonify({
+    return _json({
         "status": "Operational",
         "conveyor_queue_size": len(wm.conveyor_queue),
         "loading_stack_size": len(wm.loading_stack),
@@ -53,25 +63,24 @@ def ingest_and_assign():
         destination=data['destination'],
         is_fragile=data.get('is_fragile', False)
     )
-    wm.ingest_package(new_package)
-    
-    # 2. Process (Binary Search Assignment)
-    assignment_result = wm.process_next_package()
+
+    # 2. Process (Binary Search Assignment) in a single DB transaction
+    assignment_result = wm._ingest_and_assign(new_package)
 
     # 3. Fetch final state of the package from DB
     package_db_state = wm.get_package_status(data['tracking_id'])
     
     if "ASSIGNED" in assignment_result:
-        return jsonify({
+        return _json({
             "status": "Success",
             "message": assignment_result,
             "package": _package_to_dict(package_db_state)
-        }), 200
+        })
     else:
-        return jsonify({
+        return _json({
             "status": "Failure",
             "message": assignment_result
-        }), 400
+        }, 400)
 
 @app.route('/api/shipment/prepare', methods=['POST'])
 def prepare_shipment_api():
@@ -84,19 +93,18 @@ def prepare_shipment_api():
     zip_code = data.get('zip_code')
     
     if not truck_id or not zip_code:
-        return jsonify({"status": "error", "message": "Missing truck_id or zip_code"}), 400
+        return _json({"status": "error", "message": "Missing truck_id or zip_code"}, 400)
         
     # The LogiMaster method handles the core logic (Backtracking, DB update, LIFO push)
-    wm.prepare_shipment(truck_id, zip_code)
-    
-    # Simple check on the LIFO stack to confirm packages were added
-    packages_loaded = [p for p in wm.loading_stack if wm.loading_stack.index(p) >= len(wm.loading_stack) - 1] # Simple check to see recent additions
+    # and returns exactly the ids this call pushed, even with other shipments in flight
+    newly_loaded = wm.prepare_shipment(truck_id, zip_code)
     
-    return jsonify({
+    return _json({
         "status": "Shipment Prepared",
         "truck_id": truck_id,
         "zip_code_filter": zip_code,
         "loading_stack_size": len(wm.loading_stack),
+        "packages_loaded": newly_loaded,
         "message": f"Backtracking completed for Truck {truck_id}. Check status endpoint for details."
     })
 
@@ -1,4 +1,4 @@
-from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, Boolean, ForeignKey
+from sqlalchemy import create_engine, event, Column, Integer, String, Float, DateTime, Boolean, ForeignKey, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from datetime import datetime
@@ -7,6 +7,24 @@ from datetime import datetime
 DATABASE_URL = "sqlite:///warehouse.db"
 Base = declarative_base()
 
+
+def _sqlite_pragmas(dbapi_conn, connection_record):
+    """Tunes every new SQLite connection (WAL lets readers run alongside the writer)."""
+    cursor = dbapi_conn.cursor()
+    cursor.execute('PRAGMA journal_mode=WAL')
+    cursor.execute('PRAGMA synchronous=NORMAL')     # Safe with WAL, fewer fsyncs per commit
+    cursor.execute('PRAGMA temp_store=MEMORY')
+    cursor.execute('PRAGMA cache_size=-65536')      # 64 MB page cache
+    cursor.execute('PRAGMA mmap_size=268435456')    # 256 MB memory-mapped I/O
+    cursor.close()
+
+
+def create_db_engine(**kwargs):
+    """Creates the warehouse engine with the SQLite PRAGMAs applied on connect."""
+    engine = create_engine(DATABASE_URL, **kwargs)
+    event.listen(engine, 'connect', _sqlite_pragmas)
+    return engine
+
 # 2. Table Definitions (Declarative Base)
 
 class StorageBin(Base):
@@ -55,6 +73,12 @@ class ShipmentLog(Base):
     package_size = Column(Float, nullable=False)
 
 
+# Indexes for the hot lookups
+# (prepare_shipment fetches candidates by primary key, so packages need no extra index)
+# The Auditor is queried by tracking_id
+ix_log_tid = Index('ix_log_tid', ShipmentLog.tracking_id)
+
+
 # 3. Setup and Seeding Functions
 
 
@@ -64,8 +88,10 @@ def initialize_db(engine=None): # <-- Engine is now optional
     # 1. Create Engine if not provided (needed for standalone runs like main.py)
     if engine is None:
         print("Creating database schema at sqlite:///warehouse.db...")
-        engine = create_engine(DATABASE_URL)
+        engine = create_db_engine()
         Base.metadata.create_all(engine)
+        # create_all skips indexes on tables that already exist (e.g. an older warehouse.db)
+        ix_log_tid.create(engine, checkfirst=True)
         print("Database schema created successfully.")
     
     # 2. Seed Data
@@ -124,7 +150,7 @@ def seed_data(Session):
         session.close()
 
 if __name__ == '__main__':
-    engine = create_engine(DATABASE_URL)
+    engine = create_db_engine()
     initialize_db(engine)
     
     Session = sessionmaker(bind=engine)
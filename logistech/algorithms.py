@@ -1,27 +1,81 @@
 # logistech/algorithms.py
 
-def find_optimal_shipment(packages: list, target_capacity: float) -> list:
+import math
+import numpy as np
+from logistech.algorithms_numba import NUMBA_AVAILABLE, MAX_MASK_PACKAGES, knapsack_bitmask
+
+# Without Numba, candidate counts up to this size are solved exactly by the
+# backtracker; larger sets use the (approximate) pseudo-polynomial DP below.
+_BACKTRACK_MAX_PACKAGES = 10
+
+# With Numba, the compiled backtracker stays fast for larger exact searches
+_JIT_MAX_PACKAGES = min(24, MAX_MASK_PACKAGES)
+
+# Sizes are quantized to 0.1 units for the DP table
+_SIZE_RESOLUTION = 10
+
+
+def find_optimal_shipment(packages: list, target_capacity: float,
+                          pre_sorted: bool = False, sizes: np.ndarray | None = None) -> list:
     """
-    Module B: Recursive Backtracking Algorithm for Cargo Loading.
-    Finds a subset of packages whose total size is CLOSEST TO but does not 
-    EXCEED the target_capacity.
+    Module B: Cargo Loading (Subset-Sum).
+    Finds a subset of packages whose total size does not EXCEED the target_capacity.
+    Small candidate sets use exact Backtracking (Numba-compiled for up to
+    24 packages), which returns the load CLOSEST TO the target.
+    Larger sets use an iterative 0/1 knapsack DP over sizes rounded up to
+    0.1 units: the load still fits, but may fall short of the exact optimum.
+
+    Pass pre_sorted=True when packages are already sorted by size (descending),
+    and optionally their sizes as a float64 array, to skip re-deriving both.
     """
-    
+
     # Sort packages by size (descending) to prioritize filling large gaps.
-    sorted_packages = sorted(packages, key=lambda p: p.size, reverse=True)
-    
+    if pre_sorted:
+        sorted_packages = packages
+    else:
+        sorted_packages = sorted(packages, key=lambda p: p.size, reverse=True)
+        sizes = None # Caller's sizes (if any) no longer line up with the sorted order
+
+    if sizes is None:
+        sizes = np.array([p.size for p in sorted_packages], dtype=np.float64)
+
+    if NUMBA_AVAILABLE and len(sorted_packages) <= _JIT_MAX_PACKAGES:
+        mask = int(knapsack_bitmask(sizes, float(target_capacity)))
+        return [p for i, p in enumerate(sorted_packages) if (mask >> i) & 1]
+
+    if len(sorted_packages) <= _BACKTRACK_MAX_PACKAGES:
+        return _backtrack_shipment(sorted_packages, target_capacity, sizes)
+
+    return _knapsack_shipment(sorted_packages, target_capacity, sizes)
+
+
+def _backtrack_shipment(sorted_packages: list, target_capacity: float, sizes: np.ndarray) -> list:
+    """
+    Recursive Backtracking over packages pre-sorted by size (descending).
+    Branches are cut with an upper bound built from suffix sums, but the
+    worst case is still exponential, so it is only used for small inputs.
+    """
+
+    # suffix[i] = total size of sorted_packages[i:] (suffix[len] = 0.0)
+    suffix = np.concatenate([np.cumsum(sizes[::-1])[::-1], [0.0]]).tolist()
+
     best_load = []
     best_size = 0.0
 
     def backtrack(index: int, current_load: list, current_size: float):
         nonlocal best_load, best_size
 
+        # --- BOUND: Prune if even taking everything left can't beat the best ---
+        # (fractional relaxation: the load can never exceed the target either)
+        if min(current_size + suffix[index], target_capacity) <= best_size:
+            return
+
         # --- BASE CASE 1: Best Solution Found ---
         if current_size == target_capacity:
             best_load = current_load[:]
             best_size = current_size
-            return 
-        
+            return
+
         # --- BASE CASE 2: Better Solution Found ---
         # Update best solution if current one is closer to the target
         if current_size > best_size:
@@ -30,21 +84,68 @@ def find_optimal_shipment(packages: list, target_capacity: float) -> list:
 
         # --- RECURSIVE STEP ---
         for i in range(index, len(sorted_packages)):
+            # Stop exploring siblings once a perfect fit has been found
+            if best_size == target_capacity:
+                return
+
             package = sorted_packages[i]
-            
+
             # Pruning Step: Stop if adding the next package exceeds the target capacity
             if current_size + package.size <= target_capacity:
-                
+
                 # 1. Choose (Include the package)
                 current_load.append(package)
-                
+
                 # 2. Recurse (Explore next package combination)
                 backtrack(i + 1, current_load, current_size + package.size)
-                
+
                 # 3. Un-Choose (Backtrack - Remove the package to explore other combinations)
                 current_load.pop()
-                
+
     # Start the recursion from index 0 with an empty load and size 0.0
     backtrack(0, [], 0.0)
-    
-    return best_load
\ No newline at end of file
+
+    return best_load
+
+
+def _knapsack_shipment(sorted_packages: list, target_capacity: float, sizes: np.ndarray) -> list:
+    """
+    Iterative 0/1 knapsack (O(N * C)) over integer size units.
+    Package sizes are rounded UP and the capacity DOWN, so the returned
+    load never exceeds target_capacity.
+    """
+
+    # 1. Quantize sizes and capacity to integer units
+    sizes = np.ceil(np.round(sizes * _SIZE_RESOLUTION, 9)).astype(np.int64)
+    capacity = math.floor(round(target_capacity * _SIZE_RESOLUTION, 9))
+    # No point tracking capacities beyond what all packages together can fill
+    capacity = min(capacity, int(sizes.sum()))
+    if capacity <= 0:
+        return []
+
+    # 2. Fill the table: dp[w] = largest load (in units) that fits in w units.
+    #    taken[i] is a bit-packed row marking the capacities where item i improved dp.
+    dp = np.zeros(capacity + 1, dtype=np.int64)
+    taken = np.zeros((len(sizes), (capacity + 8) // 8), dtype=np.uint8)
+    improved = np.zeros(capacity + 1, dtype=bool)
+
+    for i, size in enumerate(sizes):
+        if size == 0 or size > capacity:
+            continue
+        # The right-hand side is computed from the previous row before assignment (0/1 semantics)
+        with_item = dp[:capacity + 1 - size] + size
+        improved[:] = False
+        improved[size:] = with_item > dp[size:]
+        dp[size:] = np.maximum(dp[size:], with_item)
+        taken[i] = np.packbits(improved)
+
+    # 3. Reconstruct the load by walking back from the best reachable capacity
+    w = int(dp.argmax())
+    best_load = []
+    for i in range(len(sizes) - 1, -1, -1):
+        if (taken[i, w >> 3] >> (7 - (w & 7))) & 1:
+            best_load.append(sorted_packages[i])
+            w -= int(sizes[i])
+
+    best_load.reverse()
+    return best_load
@@ -0,0 +1,80 @@
+# logistech/algorithms_numba.py
+
+import numpy as np
+
+# Numba is listed in requirements.txt; if it is missing, find_optimal_shipment
+# falls back to its pure Python paths (exact only up to 10 packages).
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+# The chosen subset is returned as a 64-bit mask
+MAX_MASK_PACKAGES = 64
+
+
+def _knapsack_bitmask(sizes: np.ndarray, target: float) -> np.uint64:
+    """
+    Module B (compiled): Iterative Backtracking over sizes sorted descending.
+    Returns a bitmask of the chosen indices whose total size is CLOSEST TO
+    but does not EXCEED target. Requires len(sizes) <= MAX_MASK_PACKAGES.
+    """
+    n = sizes.shape[0]
+
+    # suffix[i] = total size of sizes[i:], used for the upper-bound prune
+    suffix = np.zeros(n + 1, dtype=np.float64)
+    for i in range(n - 1, -1, -1):
+        suffix[i] = suffix[i + 1] + sizes[i]
+
+    best_size = 0.0
+    best_mask = np.uint64(0)
+
+    # Explicit DFS stack of (index, current_size, mask) frames replaces the recursion.
+    # Each level leaves at most one pending sibling, so n + 2 slots are enough.
+    stack_index = np.empty(n + 2, dtype=np.int64)
+    stack_size = np.empty(n + 2, dtype=np.float64)
+    stack_mask = np.empty(n + 2, dtype=np.uint64)
+
+    top = 0
+    stack_index[0] = 0
+    stack_size[0] = 0.0
+    stack_mask[0] = np.uint64(0)
+
+    while top >= 0:
+        index = stack_index[top]
+        current_size = stack_size[top]
+        mask = stack_mask[top]
+        top -= 1
+
+        # Better Solution Found (stop outright on a perfect fit)
+        if current_size > best_size:
+            best_size = current_size
+            best_mask = mask
+            if best_size == target:
+                break
+
+        # Leaf, or taking everything left still can't beat the best
+        if index == n or min(current_size + suffix[index], target) <= best_size:
+            continue
+
+        # Un-Choose branch (explored after the Choose branch below)
+        top += 1
+        stack_index[top] = index + 1
+        stack_size[top] = current_size
+        stack_mask[top] = mask
+
+        # Choose branch, only if the package still fits
+        if current_size + sizes[index] <= target:
+            top += 1
+            stack_index[top] = index + 1
+            stack_size[top] = current_size + sizes[index]
+            stack_mask[top] = mask | (np.uint64(1) << np.uint64(index))
+
+    return best_mask
+
+
+if NUMBA_AVAILABLE:
+    knapsack_bitmask = njit(cache=True)(_knapsack_bitmask)
+else:
+    knapsack_bitmask = _knapsack_bitmask
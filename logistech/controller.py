@@ -1,48 +1,97 @@
 # logistech/controller.py
 
-from collections import deque
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+import atexit
+import queue
+import threading
+import time
+from collections import defaultdict, deque
+from datetime import datetime
+import numpy as np
+from sortedcontainers import SortedKeyList
+from sqlalchemy import bindparam, insert, select, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import scoped_session, sessionmaker
 from logistech.models import StorageBin, Package
 # Import all required database models from setup.py
-from db.setup import DATABASE_URL, Base, StorageBin as DBSQLABin, ShipmentLog, Package as DBSQLAPackage 
-from logistech.algorithms import find_optimal_shipment 
+from db.setup import create_db_engine, Base, StorageBin as DBSQLABin, ShipmentLog, Package as DBSQLAPackage
+from logistech.algorithms import find_optimal_shipment
 from db.setup import DeliveryTruck as DBSQLATruck
-from sqlalchemy.pool import NullPool # Add this line to the imports section
+
+# Max entries kept in the best-fit memo (oldest evicted first)
+_FIT_CACHE_SIZE = 64
+
+# Background Auditor: flush after this many rows or this many seconds
+_LOG_BATCH_SIZE = 100
+_LOG_FLUSH_INTERVAL = 0.1
+
+# Statements built once at import and reused, so every call hits SQLAlchemy's compiled cache
+_SELECT_BINS = (
+    select(DBSQLABin.bin_id, DBSQLABin.max_capacity, DBSQLABin.location_code, DBSQLABin.current_occupancy)
+    .order_by(DBSQLABin.max_capacity)
+)
+# 'ids' is an expanding parameter: one compiled form serves IN lists of any length.
+# The ZIP and bin predicates keep the DB authoritative over the in-memory ZIP index.
+_SELECT_CANDIDATES = (
+    select(DBSQLAPackage.tracking_id, DBSQLAPackage.package_size, DBSQLAPackage.destination_zip, DBSQLAPackage.is_fragile)
+    .where(
+        DBSQLAPackage.tracking_id.in_(bindparam('ids', expanding=True)),
+        DBSQLAPackage.destination_zip == bindparam('zip'),
+        DBSQLAPackage.current_bin_id.isnot(None)
+    )
+)
+
 
 # --- C. The "Control Tower" (Singleton Pattern) ---
 class LogiMaster:
     """
     The Warehouse Controller: Implemented as a Singleton.
     It is the single source of truth for inventory space and truck schedules.
+    Use the module-level `logimaster` instance instead of constructing a new one.
     """
-    _instance = None
-    
-    def __new__(cls, *args, **kwargs):
-        if cls._instance is None:
-            cls._instance = super().__new__(cls)
-        return cls._instance
+    __slots__ = (
+        'engine', 'Session', 'bin_inventory', 'bins_by_remaining', 'conveyor_queue', 'loading_stack',
+        '_fit_cache', '_by_zip', '_occ_epoch', '_status_cache', '_sorted_by_zip',
+        '_loading_set', '_log_q', '_log_thread', '_alloc_lock'
+    )
 
     def __init__(self):
-        # Prevent re-initialization if already done
-        if hasattr(self, '_initialized') and self._initialized:
-            return
-            
         print("Initializing LogiMaster: Connecting DB and loading configuration.")
         
         # 1. Database Connection
-        #self.engine = create_engine(DATABASE_URL)
-        # CRUCIAL FIX: Disable connection pooling for SQLite to prevent 'database is locked' errors
-        self.engine = create_engine(DATABASE_URL, poolclass=NullPool)
+        # File-backed SQLite uses SQLAlchemy's default QueuePool: connections are checked out per session
+        # WAL and the other SQLite PRAGMAs are applied on connect by db.setup
+        self.engine = create_db_engine(connect_args={'check_same_thread': False})
         Base.metadata.bind = self.engine
-        self.DBSession = sessionmaker(bind=self.engine)
+        # Thread-local session registry; app.py calls Session.remove() at request teardown
+        self.Session = scoped_session(sessionmaker(bind=self.engine))
         
         # 2. Attributes (as required by HLD)
         self.bin_inventory = self._load_and_sort_bins() # Sorted List
         self.conveyor_queue = deque()                  # FIFO Queue
-        self.loading_stack = []                        # LIFO Stack (Truck Loading)
+        self.loading_stack = deque()                   # LIFO Stack (Truck Loading)
+        self._loading_set: set[str] = set()            # O(1) membership for the stack
+
+        # Guards the best-fit lookup, bins_by_remaining, the epoch and the memo across request threads
+        self._alloc_lock = threading.RLock()
+        # Best-fit memo: (package size, occupancy epoch) -> chosen bin (or None)
+        self._occ_epoch = 0                            # Bumped on every occupancy change
+        self._fit_cache: dict[tuple[float, int], StorageBin | None] = {}
+        # Rendered bin status strings and the epoch they were rendered at
+        self._status_cache: tuple[list[str] | None, int] = (None, -1)
+
+        # destination_zip -> tracking_ids currently stored in bins (shipment candidates).
+        # Inner dicts act as insertion-ordered sets; ids are always filed under their DB destination_zip.
+        self._by_zip: defaultdict[str, dict[str, None]] = self._load_zip_index()
+        # destination_zip -> (candidate ids it was built from, sizes, packages sorted by size desc)
+        self._sorted_by_zip: dict[str, tuple[tuple[str, ...], np.ndarray, list[Package]]] = {}
+
+        # 3. Background Auditor: ShipmentLog rows are queued and inserted in batches
+        self._log_q: queue.SimpleQueue[dict | None] = queue.SimpleQueue()
+        self._log_thread = threading.Thread(target=self._log_worker, name='logimaster-auditor', daemon=True)
+        self._log_thread.start()
+        # Drain queued rows before the interpreter exits
+        atexit.register(self._stop_log_worker)
         
-        self._initialized = True
         print(f"LogiMaster initialized with {len(self.bin_inventory)} bins.")
 
 
@@ -51,92 +100,185 @@ class LogiMaster:
         Loads all bin configurations from the SQL database and sorts them
         by capacity (max_capacity) for efficient Binary Search.
         """
-        session = self.DBSession()
+        session = self.Session()
         try:
-            sql_bins = session.query(DBSQLABin).all()
+            # Plain row tuples (already ordered by capacity): skips ORM instance construction
+            rows = session.execute(_SELECT_BINS).all()
             
             oop_bins = [
                 StorageBin(
-                    bin_id=b.bin_id, 
-                    capacity=b.max_capacity, 
-                    location_code=b.location_code, 
-                    current_occupancy=b.current_occupancy
+                    bin_id=bin_id, 
+                    capacity=cap, 
+                    location_code=loc, 
+                    current_occupancy=occ
                 )
-                for b in sql_bins
+                for bin_id, cap, loc, occ in rows
             ]
             
-            oop_bins.sort()
+            # Same bins ordered by remaining capacity; kept in sync by _occupy/_release
+            self.bins_by_remaining = SortedKeyList(oop_bins, key=StorageBin.get_remaining_capacity)
             return oop_bins
             
         except Exception as e:
             print(f"Error loading bins: {e}")
+            self.bins_by_remaining = SortedKeyList(key=StorageBin.get_remaining_capacity)
             return []
+        finally:
+            session.close() # End the read-only transaction
+
+    def _load_zip_index(self) -> defaultdict[str, dict[str, None]]:
+        """
+        Builds the in-memory destination_zip -> tracking_id index from
+        the packages that are currently stored in a bin.
+        """
+        by_zip = defaultdict(dict)
+        session = self.Session()
+        try:
+            rows = session.execute(
+                select(DBSQLAPackage.destination_zip, DBSQLAPackage.tracking_id)
+                .where(DBSQLAPackage.current_bin_id.isnot(None))
+            ).all()
+            for zip_code, tracking_id in rows:
+                by_zip[zip_code][tracking_id] = None
+        except Exception as e:
+            print(f"Error loading package index: {e}")
         finally:
             session.close()
+        return by_zip
             
     # ====================================================================
     # MODULE A: BINARY SEARCH (O(log N)) - The "Best-Fit" Selector
     # ====================================================================
 
+    def _search_best_fit(self, package_size: float) -> StorageBin | None:
+        """
+        Returns the bin with the LEAST remaining capacity that still
+        holds package_size (Binary Search over bins_by_remaining), or None.
+        """
+        bins = self.bins_by_remaining
+        # One bisect on the remaining-capacity keys; an exact-size fit lands here directly
+        idx = bins.bisect_key_left(package_size)
+        return bins[idx] if idx < len(bins) else None
+
     def find_best_fit_bin(self, package_size: float) -> StorageBin | None:
         """
-        Uses Binary Search (O(log N)) to find the smallest StorageBin 
-        with capacity >= package_size AND sufficient remaining capacity.
+        Uses Binary Search (O(log N)) to find the Best-Fit StorageBin:
+        the one whose remaining capacity is the tightest fit for package_size.
+        Results are memoized per exact size until any bin's occupancy changes,
+        so a hit only happens between assignments (repeats and "no bin" misses).
         """
-        bins = self.bin_inventory
-        low = 0
-        high = len(bins) - 1
-        best_fit_bin = None
-        
-        while low <= high:
-            mid = (low + high) // 2
-            current_bin = bins[mid]
-            
-            # Check if this bin works (capacity is large enough)
-            if current_bin.capacity >= package_size:
-                best_fit_bin = current_bin
-                # Try to find a smaller bin that also works (move left)
-                high = mid - 1
-            else:
-                # Bin is too small, look right
-                low = mid + 1
-        
-        # Final check: The chosen bin must also have available space
-        if best_fit_bin and best_fit_bin.get_remaining_capacity() >= package_size:
-            return best_fit_bin
+        with self._alloc_lock:
+            # The epoch in the key means a cached bin is still the tightest fit for this size
+            key = (package_size, self._occ_epoch)
+
+            if key in self._fit_cache:
+                return self._fit_cache[key]
+
+            best_bin = self._search_best_fit(package_size)
+            if len(self._fit_cache) >= _FIT_CACHE_SIZE:
+                del self._fit_cache[next(iter(self._fit_cache))] # FIFO eviction
+            self._fit_cache[key] = best_bin
         
-        return None 
+        return best_bin
+
+    def _reserve_best_fit(self, package_size: float) -> StorageBin | None:
+        """
+        Finds the Best-Fit bin and occupies package_size in it as one atomic step,
+        so concurrent ingests never pick the same space. Returns None if nothing fits.
+        """
+        with self._alloc_lock:
+            best_bin = self.find_best_fit_bin(package_size)
+            if best_bin and self._occupy(best_bin, package_size):
+                return best_bin
+            return None
+
+    def _occupy(self, bin_obj: StorageBin, amount: float) -> bool:
+        """Occupies space in a bin, keeping bins_by_remaining ordered."""
+        with self._alloc_lock:
+            # The bin must leave the sorted list before its key (remaining capacity) changes
+            self.bins_by_remaining.remove(bin_obj)
+            stored = bin_obj.occupy_space(amount)
+            self.bins_by_remaining.add(bin_obj)
+            self._occ_epoch += 1
+        return stored
+
+    def _release(self, bin_obj: StorageBin, amount: float):
+        """Frees space in a bin, keeping bins_by_remaining ordered."""
+        with self._alloc_lock:
+            self.bins_by_remaining.remove(bin_obj)
+            bin_obj.free_space(amount)
+            self.bins_by_remaining.add(bin_obj)
+            self._occ_epoch += 1
 
     # ====================================================================
     # INGESTION LOGIC (FIFO Queue) & SQL Auditor (Module C)
     # ====================================================================
 
     def _log_shipment(self, tracking_id, size, status, bin_id=None, truck_id=None):
-        """Helper to create a new ShipmentLog record (Auditor)."""
-        session = self.DBSession()
+        """Helper to queue a new ShipmentLog record (Auditor); written by the background worker."""
+        self._log_q.put({
+            'tracking_id': tracking_id,
+            'package_size': size,
+            'status': status,
+            'bin_id': bin_id,
+            'truck_id': truck_id,
+            'timestamp': datetime.now() # Time of the event, not of the batched INSERT
+        })
+
+    def _log_worker(self):
+        """
+        Background Auditor thread: drains the log queue and inserts rows in
+        batches of up to _LOG_BATCH_SIZE or every _LOG_FLUSH_INTERVAL seconds.
+        A None item flushes what is pending and stops the worker.
+        """
+        batch = []
+        batch_started = 0.0
+        while True:
+            try:
+                item = self._log_q.get(timeout=_LOG_FLUSH_INTERVAL)
+            except queue.Empty:
+                if batch:
+                    self._flush_logs(batch)
+                    batch = []
+                continue
+
+            if item is None:
+                if batch:
+                    self._flush_logs(batch)
+                return
+
+            if not batch:
+                batch_started = time.monotonic()
+            batch.append(item)
+
+            if len(batch) >= _LOG_BATCH_SIZE or time.monotonic() - batch_started >= _LOG_FLUSH_INTERVAL:
+                self._flush_logs(batch)
+                batch = []
+
+    def _flush_logs(self, batch: list[dict]):
+        """Writes a batch of queued ShipmentLog rows in one INSERT and one commit."""
+        session = self.Session() # The worker thread's own scoped session
         try:
-            log_entry = ShipmentLog(
-                tracking_id=tracking_id,
-                package_size=size,
-                status=status,
-                bin_id=bin_id,
-                truck_id=truck_id
-            )
-            session.add(log_entry)
+            session.execute(insert(ShipmentLog), batch)
             session.commit()
         except Exception as e:
             session.rollback()
-            print(f"!! AUDITOR ERROR: Failed to log shipment status: {e}")
-        finally:
-            session.close()
+            print(f"!! AUDITOR ERROR: Failed to log {len(batch)} shipment status rows: {e}")
+
+    def _stop_log_worker(self):
+        """Flushes any queued ShipmentLog rows and stops the background worker."""
+        if self._log_thread.is_alive():
+            self._log_q.put(None)
+            self._log_thread.join(timeout=5)
 
     def _update_db_assignment(self, package: Package, bin_obj: StorageBin):
         """Helper to update the current location of the package and bin occupancy."""
-        session = self.DBSession()
+        session = self.Session()
         try:
             # 1. Update the Bin's occupancy in the 'storage_bins' table
             sql_bin = session.query(DBSQLABin).filter_by(bin_id=bin_obj.bin_id).one()
-            sql_bin.current_occupancy = bin_obj.occupancy
+            # Added in SQL, so concurrent assignments to the same bin can't overwrite each other
+            sql_bin.current_occupancy = DBSQLABin.current_occupancy + package.size
 
             # 2. Update the Package's location (and create package record if new)
             sql_package = session.query(DBSQLAPackage).filter_by(tracking_id=package.tracking_id).first()
@@ -151,13 +293,14 @@ class LogiMaster:
                 
             sql_package.current_bin_id = bin_obj.bin_id
             sql_package.current_truck_id = None # Ensure package is not marked as being on a truck
+            # An existing record keeps its stored destination, so index under that ZIP
+            stored_zip = sql_package.destination_zip
 
             session.commit()
+            self._by_zip[stored_zip][package.tracking_id] = None
         except Exception as e:
             session.rollback()
             raise e # Re-raise to trigger rollback in process_next_package
-        finally:
-            session.close()
 
     def ingest_package(self, package: Package):
         """
@@ -178,90 +321,198 @@ class LogiMaster:
         package = self.conveyor_queue.popleft()
         print(f"\n<- PROCESSING: Package {package.tracking_id} (Size: {package.size})")
 
-        # 1. Find the Best-Fit Bin using O(log N) search
-        best_bin = self.find_best_fit_bin(package.size)
+        # 1. Find the Best-Fit Bin using O(log N) search and take its space in memory (atomically)
+        best_bin = self._reserve_best_fit(package.size)
 
         if best_bin:
             try:
-                # 2. Update in-memory state
-                best_bin.occupy_space(package.size)
-                
-                # 3. Update Package and Bin in SQL (Persistence)
+                # 2. Update Package and Bin in SQL (Persistence)
                 self._update_db_assignment(package, best_bin)
                 
                 print(f"   ASSIGNED: Found Best-Fit Bin {best_bin.bin_id} at {best_bin.location_code}.")
                 print(f"   Bin Occupancy: {best_bin.occupancy:.1f}/{best_bin.capacity:.1f}")
                 
-                # 4. Log the assignment (Auditor requirement)
+                # 3. Log the assignment (Auditor requirement)
                 self._log_shipment(package.tracking_id, package.size, 'BIN_ASSIGNED', bin_id=best_bin.bin_id)
 
             except Exception as e:
                 # Catch crash scenario, rollback allocation, put package back (Module C requirement)
                 print(f"   !! ERROR: Assignment failed due to {e}. Rolling back allocation.")
-                best_bin.free_space(package.size) 
+                self._release(best_bin, package.size)
                 self.conveyor_queue.appendleft(package) 
                 
         else:
             print(f"   !! FAILURE: No suitable bin found for Package {package.tracking_id}.")
-    
+
+    def _ingest_and_assign(self, package: Package) -> str:
+        """
+        Ingests a package and immediately assigns it to its Best-Fit bin.
+        The bin occupancy, package upsert and both audit rows are written
+        in ONE transaction (one commit instead of four on the API path).
+        """
+        print(f"-> INGESTED: Package {package.tracking_id} (Size: {package.size})")
+
+        ingested_row = {
+            'tracking_id': package.tracking_id,
+            'package_size': package.size,
+            'status': 'INGESTED',
+            'bin_id': None
+        }
+
+        # 1. Find the Best-Fit Bin using O(log N) search and take its space in memory.
+        #    Done before the transaction, so the rollback below only undoes space actually taken.
+        best_bin = self._reserve_best_fit(package.size)
+        session = self.Session()
+
+        if not best_bin:
+            try:
+                session.execute(insert(ShipmentLog), [ingested_row])
+                session.commit()
+            except Exception as e:
+                session.rollback()
+                print(f"!! AUDITOR ERROR: Failed to log shipment status: {e}")
+            print(f"   !! FAILURE: No suitable bin found for Package {package.tracking_id}.")
+            return f"FAILURE: No suitable bin found for Package {package.tracking_id}."
+
+        try:
+            # 2. Update Bin occupancy and upsert the Package location
+            session.execute(
+                update(DBSQLABin)
+                .where(DBSQLABin.bin_id == best_bin.bin_id)
+                .values(current_occupancy=DBSQLABin.current_occupancy + package.size) # Concurrent-safe increment
+            )
+            # An existing record keeps its stored destination; RETURNING reports the ZIP to index under
+            stored_zip = session.execute(
+                sqlite_insert(DBSQLAPackage)
+                .values(
+                    tracking_id=package.tracking_id,
+                    package_size=package.size,
+                    destination_zip=package.destination,
+                    is_fragile=package.is_fragile,
+                    current_bin_id=best_bin.bin_id,
+                    current_truck_id=None
+                )
+                .on_conflict_do_update(
+                    index_elements=['tracking_id'],
+                    set_={'current_bin_id': best_bin.bin_id, 'current_truck_id': None}
+                )
+                .returning(DBSQLAPackage.destination_zip)
+            ).scalar_one()
+
+            # 3. Log ingestion and assignment together (Auditor requirement)
+            assigned_row = dict(ingested_row, status='BIN_ASSIGNED', bin_id=best_bin.bin_id)
+            session.execute(insert(ShipmentLog), [ingested_row, assigned_row])
+
+            session.commit()
+            self._by_zip[stored_zip][package.tracking_id] = None
+        except Exception as e:
+            # Rollback allocation and report the error; the API path never drains the conveyor,
+            # so the package is not queued. Its INGESTED row went with the rollback: re-log it.
+            session.rollback()
+            print(f"   !! ERROR: Assignment failed due to {e}. Rolling back allocation.")
+            self._release(best_bin, package.size)
+            self._log_shipment(package.tracking_id, package.size, 'INGESTED')
+            return f"ERROR: Assignment failed for Package {package.tracking_id}: {e}"
+
+        print(f"   ASSIGNED: Found Best-Fit Bin {best_bin.bin_id} at {best_bin.location_code}.")
+        print(f"   Bin Occupancy: {best_bin.occupancy:.1f}/{best_bin.capacity:.1f}")
+        return f"ASSIGNED: Package {package.tracking_id} to Bin {best_bin.bin_id} ({best_bin.location_code})."
+
+    def contains(self, tracking_id: str) -> bool:
+        """Returns True if the package is on the LIFO loading stack (O(1))."""
+        return tracking_id in self._loading_set
+
+    def get_bin_status(self) -> list[str]:
+        """Returns str() of every bin, re-rendered only after an occupancy change."""
+        with self._alloc_lock:
+            rendered, cached_epoch = self._status_cache
+            if cached_epoch != self._occ_epoch:
+                rendered = [str(b) for b in self.bin_inventory]
+                self._status_cache = (rendered, self._occ_epoch)
+        return rendered
+
+    def get_package_status(self, tracking_id: str) -> DBSQLAPackage | None:
+        """Helper to fetch the current SQL record of a package (returned detached)."""
+        session = self.Session()
+        try:
+            return session.get(DBSQLAPackage, tracking_id)
+        finally:
+            session.close() # Loaded attributes stay readable after close
+
     def get_packages_in_bin(self, bin_id: int) -> list[Package]:
         """Helper to retrieve all Package objects currently stored in a given bin."""
-        session = self.DBSession()
+        session = self.Session()
         try:
-            # 1. Get the SQL package records
-            sql_packages = session.query(DBSQLAPackage).filter_by(current_bin_id=bin_id).all()
-            
-            # 2. Convert to in-memory OOP Package objects
-            oop_packages = [
-                Package(
-                    tracking_id=p.tracking_id,
-                    size=p.package_size,
-                    destination=p.destination_zip,
-                    is_fragile=p.is_fragile
-                )
-                for p in sql_packages
-            ]
-            return oop_packages
+            # 1. Get the SQL package records (as plain row tuples)
+            rows = session.execute(
+                select(DBSQLAPackage.tracking_id, DBSQLAPackage.package_size, DBSQLAPackage.destination_zip, DBSQLAPackage.is_fragile)
+                .where(DBSQLAPackage.current_bin_id == bin_id)
+            ).all()
         finally:
             session.close()
+        
+        # 2. Convert to in-memory OOP Package objects
+        oop_packages = [
+            Package(
+                tracking_id=tid,
+                size=size,
+                destination=dest,
+                is_fragile=fragile
+            )
+            for tid, size, dest, fragile in rows
+        ]
+        return oop_packages
 
-    def prepare_shipment(self, truck_id: int, zip_code_filter: str):
+    def prepare_shipment(self, truck_id: int, zip_code_filter: str) -> list[str]:
         """
         Module B: Finds the optimal cargo load for a truck using Backtracking.
         1. Queries all packages destined for the target ZIP.
         2. Calls the Backtracking algorithm.
         3. Loads packages onto the LIFO Stack and updates the DB.
+        Returns the tracking_ids pushed onto the stack ([] if nothing was loaded).
         """
         print(f"\n--- PREPARING SHIPMENT for TRUCK {truck_id} (ZIP: {zip_code_filter}) ---")
-        session = self.DBSession()
+        session = self.Session()
         
         try:
             # 1. Get Truck Capacity
             sql_truck = session.query(DBSQLATruck).filter_by(truck_id=truck_id).one()
             truck_capacity = sql_truck.max_capacity
             
-            # 2. Query Candidate Packages (those in a bin AND matching destination)
-            sql_candidates = session.query(DBSQLAPackage).filter(
-                DBSQLAPackage.current_bin_id.isnot(None), 
-                DBSQLAPackage.destination_zip == zip_code_filter
-            ).all()
-            
-            # 3. Convert candidates to OOP models for the algorithm
-            candidate_packages = [
-                Package(p.tracking_id, p.package_size, p.destination_zip, p.is_fragile)
-                for p in sql_candidates
-            ]
+            # 2. Look up Candidate Packages (those in a bin AND matching destination)
+            #    via the in-memory ZIP index, then fetch them by primary key
+            candidate_ids = tuple(self._by_zip.get(zip_code_filter, ()))
+            cached = self._sorted_by_zip.get(zip_code_filter)
+
+            if cached and cached[0] == candidate_ids:
+                # Same candidates as last time: reuse the sorted packages, no query or sort
+                _, sizes, candidate_packages = cached
+            else:
+                rows = []
+                if candidate_ids:
+                    rows = session.execute(
+                        _SELECT_CANDIDATES, {'ids': list(candidate_ids), 'zip': zip_code_filter}
+                    ).all()
+                
+                # 3. Convert candidates to OOP models for the algorithm (sorted once, descending)
+                candidate_packages = sorted(
+                    (Package(tid, size, dest, fragile) for tid, size, dest, fragile in rows),
+                    key=lambda p: p.size, reverse=True
+                )
+                sizes = np.array([p.size for p in candidate_packages], dtype=np.float64)
+                if candidate_ids:
+                    self._sorted_by_zip[zip_code_filter] = (candidate_ids, sizes, candidate_packages)
             
             if not candidate_packages:
                 print("!! No packages found for this destination.")
-                return
+                return []
 
             # 4. Run Backtracking Algorithm
-            optimal_load = find_optimal_shipment(candidate_packages, truck_capacity)
+            optimal_load = find_optimal_shipment(candidate_packages, truck_capacity, pre_sorted=True, sizes=sizes)
             
             if not optimal_load:
                 print("!! Optimal load found 0 packages that fit.")
-                return
+                return []
 
             total_size = sum(p.size for p in optimal_load)
             print(f"-> BACKTRACKING COMPLETE: Optimal Load Size: {total_size:.1f}/{truck_capacity:.1f} (Packages: {len(optimal_load)})")
@@ -270,24 +521,46 @@ class LogiMaster:
             sql_truck.current_load = total_size
             sql_truck.status = 'LOADING_IN_PROGRESS'
 
-            for package in optimal_load:
-                # Add to LIFO Stack (The Stack requirement for rollback)
-                self.loading_stack.append(package.tracking_id)
-                
-                # Update Package location in DB
-                sql_package = session.query(DBSQLAPackage).filter_by(tracking_id=package.tracking_id).one()
-                sql_package.current_bin_id = None      # Remove from bin
-                sql_package.current_truck_id = truck_id # Assign to truck
-                
-                # Log the change (Auditor)
-                self._log_shipment(package.tracking_id, package.size, 'TRUCK_LOADED', truck_id=truck_id)
+            ids = [p.tracking_id for p in optimal_load]
+
+            # Update Package locations in DB with a single bulk UPDATE
+            session.execute(
+                update(DBSQLAPackage)
+                .where(DBSQLAPackage.tracking_id.in_(ids))
+                .values(current_bin_id=None, current_truck_id=truck_id) # Remove from bin, assign to truck
+            )
+
+            # Log the changes (Auditor) in the same transaction as one bulk INSERT
+            session.execute(insert(ShipmentLog), [
+                {'tracking_id': p.tracking_id, 'package_size': p.size, 'status': 'TRUCK_LOADED', 'truck_id': truck_id}
+                for p in optimal_load
+            ])
 
             session.commit()
+
+            # Add to LIFO Stack (The Stack requirement for rollback), only once the load is committed
+            self.loading_stack.extend(ids)
+            self._loading_set.update(ids)
+
+            # Loaded packages are no longer candidates for this ZIP
+            remaining = self._by_zip[zip_code_filter]
+            for tid in ids:
+                remaining.pop(tid, None)
+            if not remaining:
+                del self._by_zip[zip_code_filter]
+            self._sorted_by_zip.pop(zip_code_filter, None)
+
             print(f"-> SUCCESS: {len(optimal_load)} packages loaded onto Truck {truck_id}.")
-            print(f"-> LIFO Stack (Load Order): {self.loading_stack}")
+            print(f"-> LIFO Stack (Load Order): {list(self.loading_stack)}")
+            return ids
 
         except Exception as e:
             session.rollback()
             print(f"!! FATAL SHIPMENT ERROR: {e}. All changes rolled back.")
+            return []
         finally:
-            session.close()
\ No newline at end of file
+            session.close() # Also ends the read-only transaction on the early returns
+
+
+# The single controller instance shared by the whole process
+logimaster = LogiMaster()
@@ -5,6 +5,9 @@ class StorageUnit(ABC):
     """
     Abstract Base Class for any unit that can hold packages (Bins or Trucks).
     """
+    # ABC itself defines empty __slots__, so subclasses stay dict-free
+    __slots__ = ('capacity', 'occupancy')
+
     def __init__(self, capacity, current_occupancy=0.0):
         self.capacity = capacity
         self.occupancy = current_occupancy
@@ -24,6 +27,8 @@ class Package:
     """
     Represents an item/package being stored or shipped.
     """
+    __slots__ = ('tracking_id', 'size', 'destination', 'is_fragile', 'current_bin_id', 'current_truck_id')
+
     def __init__(self, tracking_id: str, size: float, destination: str, is_fragile: bool = False):
         self.tracking_id = tracking_id
         self.size = size
@@ -41,6 +46,8 @@ class StorageBin(StorageUnit):
     Represents a single storage location in the warehouse.
     Crucial: Implements comparison for Binary Search.
     """
+    __slots__ = ('bin_id', 'location_code')
+
     def __init__(self, bin_id: int, capacity: float, location_code: str, current_occupancy: float = 0.0):
         super().__init__(capacity, current_occupancy)
         self.bin_id = bin_id